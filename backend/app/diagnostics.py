@@ -0,0 +1,196 @@
+"""
+Process memory diagnostics for soak testing and leak hunting.
+RSS, open file handles, tracemalloc top allocators and allocator statistics.
+"""
+
+import ctypes
+import ctypes.util
+import gc
+import os
+import tracemalloc
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import torch
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Start tracemalloc on startup with this many frames per traceback (0 = off).
+# Tracing costs CPU and memory; enable it for soak runs, not in production.
+TRACEMALLOC_FRAMES = int(os.environ.get("TRACEMALLOC_FRAMES", "0"))
+
+# Number of allocation sites returned by default
+DEFAULT_TOP_ALLOCATORS = 15
+
+
+class _MallInfo2(ctypes.Structure):
+    """glibc struct mallinfo2 (glibc >= 2.33)."""
+    _fields_ = [(name, ctypes.c_size_t) for name in (
+        "arena", "ordblks", "smblks", "hblks", "hblkhd",
+        "usmblks", "fsmblks", "uordblks", "fordblks", "keepcost",
+    )]
+
+def _load_mallinfo2():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6")
+        fn = libc.mallinfo2
+        fn.restype = _MallInfo2
+        return fn
+    except (OSError, AttributeError):
+        return None
+
+_MALLINFO2 = _load_mallinfo2()
+
+# ============================================================================
+# Tracemalloc
+# ============================================================================
+
+def start_tracemalloc(frames: int = 1) -> bool:
+    """
+    Start tracemalloc if it is not already tracing.
+
+    Args:
+        frames: Number of frames stored per allocation traceback
+
+    Returns:
+        True if tracing is active
+    """
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(max(1, frames))
+        print(f"[Diagnostics] tracemalloc started ({frames} frame(s))")
+    return tracemalloc.is_tracing()
+
+def stop_tracemalloc() -> bool:
+    """
+    Stop tracemalloc and free its traces.
+
+    Returns:
+        True if tracing was active
+    """
+    if not tracemalloc.is_tracing():
+        return False
+    tracemalloc.stop()
+    print("[Diagnostics] tracemalloc stopped")
+    return True
+
+def tracemalloc_top(limit: int = DEFAULT_TOP_ALLOCATORS) -> List[Dict]:
+    """
+    Largest live allocation sites from a tracemalloc snapshot.
+
+    Args:
+        limit: Number of allocation sites to return
+
+    Returns:
+        List of {"location", "size_bytes", "count"}, largest first;
+        empty if tracemalloc is not tracing or limit <= 0
+    """
+    if limit <= 0 or not tracemalloc.is_tracing():
+        return []  # take_snapshot() copies every trace; skip it when nothing is asked for
+
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    return [
+        {
+            "location": str(stat.traceback[0]),
+            "size_bytes": stat.size,
+            "count": stat.count,
+        }
+        for stat in snapshot.statistics("lineno")[:limit]
+    ]
+
+# ============================================================================
+# Process Statistics
+# ============================================================================
+
+def get_rss_bytes() -> Optional[int]:
+    """
+    Current resident set size of this process.
+
+    Returns:
+        RSS in bytes, or None if /proc is unavailable
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def count_open_files() -> Optional[int]:
+    """
+    Number of open file descriptors (files, sockets, pipes).
+
+    Returns:
+        Descriptor count, or None if /proc is unavailable
+    """
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+def allocator_stats() -> Dict:
+    """
+    Native allocator statistics.
+
+    PyTorch's default CPU allocator is plain malloc, so glibc arena
+    statistics cover CPU tensor memory. CUDA caching allocator statistics
+    are included when a GPU is in use.
+
+    Returns:
+        Dictionary with "cpu_malloc" and "cuda" sections (None if unavailable)
+    """
+    stats = {"cpu_malloc": None, "cuda": None, "torch_num_threads": torch.get_num_threads()}
+
+    if _MALLINFO2 is not None:
+        info = _MALLINFO2()
+        stats["cpu_malloc"] = {
+            "arena_bytes": info.arena,              # Non-mmapped heap obtained from the OS
+            "mmap_bytes": info.hblkhd,              # Large blocks served by mmap
+            "in_use_bytes": info.uordblks,          # Allocated and not freed
+            "free_bytes": info.fordblks,            # Freed but retained by malloc
+            "releasable_bytes": info.keepcost,      # Top-of-heap memory malloc_trim could return
+        }
+
+    if torch.cuda.is_available():
+        stats["cuda"] = {
+            "allocated_bytes": torch.cuda.memory_allocated(),
+            "reserved_bytes": torch.cuda.memory_reserved(),
+            "max_allocated_bytes": torch.cuda.max_memory_allocated(),
+        }
+
+    return stats
+
+def memory_snapshot(top: int = DEFAULT_TOP_ALLOCATORS) -> Dict:
+    """
+    Live memory snapshot of this process.
+
+    Args:
+        top: Number of tracemalloc allocation sites to include
+
+    Returns:
+        Dictionary with RSS, open files, GC, tracemalloc and allocator statistics
+    """
+    traced_current, traced_peak = (
+        tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (None, None)
+    )
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "pid": os.getpid(),
+        "rss_bytes": get_rss_bytes(),
+        "open_files": count_open_files(),
+        "gc": {
+            "counts": gc.get_count(),           # Pending allocations per generation
+            "generations": gc.get_stats(),      # Collections / collected / uncollectable
+        },
+        "tracemalloc": {
+            "tracing": tracemalloc.is_tracing(),
+            "current_bytes": traced_current,
+            "peak_bytes": traced_peak,
+            "top": tracemalloc_top(top),
+        },
+        "allocator": allocator_stats(),
+    }
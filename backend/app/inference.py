@@ -9,7 +9,7 @@ import torchvision.models as models
 import torchvision.transforms as transforms
 from PIL import Image
 import numpy as np
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 import random
 import json
 import os
@@ -28,6 +28,16 @@ IMAGENET_STD = [0.229, 0.224, 0.225]
 # Input image size (must match model training setup)
 INPUT_SIZE = 224
 
+# Pre-decoded tensor ingestion (clients that resize to INPUT_SIZE on device)
+TENSOR_CHANNELS = 3
+MAX_TENSOR_BATCH = 32
+NPY_MAGIC = b"\x93NUMPY"
+NPY_CONTENT_TYPE = "application/x-npy"
+NPY_MAX_HEADER_BYTES = 16 * 1024
+MAX_TENSOR_PAYLOAD_BYTES = (
+    MAX_TENSOR_BATCH * INPUT_SIZE * INPUT_SIZE * TENSOR_CHANNELS + NPY_MAX_HEADER_BYTES
+)
+
 # Model names to attempt loading (in order of preference)
 PREFERRED_MODELS = [
     "models/resnet18_best.pt",
@@ -53,6 +63,10 @@ TRANSFORM = transforms.Compose([
     )
 ])
 
+# Normalization constants for pre-decoded NCHW batches (same as TRANSFORM)
+NORM_MEAN = torch.tensor(IMAGENET_MEAN, device=DEVICE).view(1, 3, 1, 1)
+NORM_STD = torch.tensor(IMAGENET_STD, device=DEVICE).view(1, 3, 1, 1)
+
 def load_labels() -> List[str]:
     """
     Load building/location labels from labels.json.
@@ -139,10 +153,11 @@ def preprocess_pil_image(pil_image: Image.Image) -> torch.Tensor:
     try:
         # Ensure RGB
         if pil_image.mode != "RGB":
-            pil_image = pil_image.convert("RGB")
+            with pil_image.convert("RGB") as rgb_image:
+                image_tensor = TRANSFORM(rgb_image).unsqueeze(0)  # Add batch dimension
+        else:
+            image_tensor = TRANSFORM(pil_image).unsqueeze(0)  # Add batch dimension
         
-        # Apply transforms
-        image_tensor = TRANSFORM(pil_image).unsqueeze(0)  # Add batch dimension
         return image_tensor.to(DEVICE)
     
     except Exception as e:
@@ -173,11 +188,10 @@ def predict_image_bytes(image_bytes: bytes) -> Dict:
         Prediction dictionary
     """
     try:
-        # Convert bytes to PIL Image
-        pil_img = Image.open(BytesIO(image_bytes)).convert("RGB")
-        
-        # Preprocess
-        img_tensor = preprocess_pil_image(pil_img)
+        # Decode and preprocess; close the buffer and image as soon as the
+        # tensor exists so long-running workers don't accumulate them
+        with BytesIO(image_bytes) as buffer, Image.open(buffer) as pil_img:
+            img_tensor = preprocess_pil_image(pil_img)
         if img_tensor is None:
             return _mock_predict(notes="Error preprocessing image")
         
@@ -186,37 +200,185 @@ def predict_image_bytes(image_bytes: bytes) -> Dict:
             return _mock_predict(image_bytes=image_bytes)
         
         # Real inference
-        with torch.no_grad():
-            outputs = MODEL(img_tensor)
-            probs = torch.nn.functional.softmax(outputs, dim=1)
-            
-            # Get top-5
-            top5_prob, top5_idx = torch.topk(probs, min(5, len(LABELS)), dim=1)
-            
-            # Build results
-            top_preds = []
-            for idx, prob in zip(top5_idx[0], top5_prob[0]):
-                class_idx = idx.item()
-                class_name = LABELS[class_idx] if class_idx < len(LABELS) else f"Unknown_{class_idx}"
-                top_preds.append({
-                    "class": class_name,
-                    "confidence": round(float(prob.item()), 4)
-                })
-            
-            result = {
-                "pred": top_preds[0]["class"],
-                "confidence": top_preds[0]["confidence"],
-                "probs": top_preds,
-                "notes": f"Real inference on {DEVICE}",
-                "gradcam_base64": None  # TODO: Add Grad-CAM if needed
-            }
-            
-            return result
+        return _run_model(img_tensor)[0]
     
     except Exception as e:
         print(f"✗ Error in predict_image_bytes: {e}")
         return _mock_predict(notes=f"Error: {str(e)}")
 
+def _run_model(img_tensor: torch.Tensor) -> List[Dict]:
+    """
+    Run the loaded model on a preprocessed batch and format top-5 results.
+    
+    Args:
+        img_tensor: Normalized tensor of shape (N, 3, INPUT_SIZE, INPUT_SIZE)
+    
+    Returns:
+        One prediction dictionary per batch item
+    """
+    with torch.no_grad():
+        outputs = MODEL(img_tensor)
+        probs = torch.nn.functional.softmax(outputs, dim=1)
+        
+        # Get top-5
+        top5_prob, top5_idx = torch.topk(probs, min(5, len(LABELS)), dim=1)
+    
+    results = []
+    for row_idx, row_prob in zip(top5_idx, top5_prob):
+        # Build results
+        top_preds = []
+        for idx, prob in zip(row_idx, row_prob):
+            class_idx = idx.item()
+            class_name = LABELS[class_idx] if class_idx < len(LABELS) else f"Unknown_{class_idx}"
+            top_preds.append({
+                "class": class_name,
+                "confidence": round(float(prob.item()), 4)
+            })
+        
+        results.append({
+            "pred": top_preds[0]["class"],
+            "confidence": top_preds[0]["confidence"],
+            "probs": top_preds,
+            "notes": f"Real inference on {DEVICE}",
+            "gradcam_base64": None  # TODO: Add Grad-CAM if needed
+        })
+    
+    return results
+
+def _npy_frombuffer(payload: Union[bytes, bytearray]) -> np.ndarray:
+    """
+    Wrap a NumPy .npy payload as an array without copying the data section.
+    
+    Only the header is parsed; the array itself is a view into the request body.
+    
+    Args:
+        payload: Bytes of a .npy file (format version 1.0 or 2.0)
+    
+    Returns:
+        uint8 array view with the shape stored in the header
+    
+    Raises:
+        ValueError: If the header is invalid or the array is not C-ordered uint8
+    """
+    if payload[:len(NPY_MAGIC)] != NPY_MAGIC:
+        raise ValueError("Body is not a .npy file (missing \\x93NUMPY magic)")
+    
+    # Copy only the header region, never the image data
+    header = BytesIO(memoryview(payload)[:NPY_MAX_HEADER_BYTES])
+    version = np.lib.format.read_magic(header)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(header)
+    elif version == (2, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(header)
+    else:
+        raise ValueError(f"Unsupported .npy format version: {version}")
+    
+    if fortran_order:
+        raise ValueError("Fortran-ordered .npy arrays are not supported")
+    if dtype != np.uint8:
+        raise ValueError(f"Expected uint8 array, got {dtype}")
+    
+    count = int(np.prod(shape))
+    offset = header.tell()
+    if len(payload) - offset != count:
+        raise ValueError(
+            f".npy data is {len(payload) - offset} bytes, header shape {shape} needs {count}"
+        )
+    return np.frombuffer(payload, dtype=np.uint8, count=count, offset=offset).reshape(shape)
+
+def decode_tensor_payload(
+    payload: Union[bytes, bytearray],
+    shape: Optional[Tuple[int, ...]] = None,
+    content_type: Optional[str] = None
+) -> np.ndarray:
+    """
+    Validate a pre-decoded image payload and wrap it as an NHWC uint8 batch.
+    
+    The format is selected by content_type:
+    - application/x-npy: NumPy .npy bytes (shape read from the header)
+    - anything else: raw uint8 RGB bytes with an explicit shape (HWC or NHWC)
+    
+    Images must already be INPUT_SIZE x INPUT_SIZE RGB. No data is copied;
+    pass a bytearray to get a writable array.
+    
+    Args:
+        payload: Request body
+        shape: Shape of a raw payload, e.g. (1, 224, 224, 3); ignored for .npy
+        content_type: Request Content-Type (without parameters)
+    
+    Returns:
+        uint8 array of shape (N, INPUT_SIZE, INPUT_SIZE, 3)
+    
+    Raises:
+        ValueError: If the payload or shape is invalid
+    """
+    if content_type == NPY_CONTENT_TYPE:
+        batch = _npy_frombuffer(payload)
+    else:
+        if shape is None:
+            raise ValueError(
+                f"Raw tensor payload requires a shape, e.g. 1,{INPUT_SIZE},{INPUT_SIZE},{TENSOR_CHANNELS}"
+            )
+        expected = int(np.prod(shape))
+        if len(payload) != expected:
+            raise ValueError(f"Payload is {len(payload)} bytes, shape {tuple(shape)} needs {expected}")
+        batch = np.frombuffer(payload, dtype=np.uint8).reshape(shape)
+    
+    # Single HWC image -> batch of one
+    if batch.ndim == 3:
+        batch = batch[np.newaxis]
+    
+    expected_hwc = (INPUT_SIZE, INPUT_SIZE, TENSOR_CHANNELS)
+    if batch.ndim != 4 or batch.shape[1:] != expected_hwc:
+        raise ValueError(
+            f"Expected shape (N, {INPUT_SIZE}, {INPUT_SIZE}, {TENSOR_CHANNELS}) "
+            f"or ({INPUT_SIZE}, {INPUT_SIZE}, {TENSOR_CHANNELS}), got {tuple(batch.shape)}"
+        )
+    if not 1 <= batch.shape[0] <= MAX_TENSOR_BATCH:
+        raise ValueError(f"Batch size must be between 1 and {MAX_TENSOR_BATCH}, got {batch.shape[0]}")
+    
+    return batch
+
+def preprocess_uint8_batch(batch: np.ndarray) -> torch.Tensor:
+    """
+    Normalize a pre-decoded NHWC uint8 batch for model inference.
+    
+    - Wraps the array with torch.from_numpy (no copy)
+    - Moves uint8 data to DEVICE before the float conversion
+    - Converts NHWC -> NCHW, scales to [0, 1], normalizes with ImageNet mean/std
+    
+    Args:
+        batch: Writable uint8 array of shape (N, INPUT_SIZE, INPUT_SIZE, 3)
+               (torch warns on read-only buffers, e.g. arrays over bytes)
+    
+    Returns:
+        Normalized float tensor of shape (N, 3, INPUT_SIZE, INPUT_SIZE) on DEVICE
+    """
+    img_tensor = torch.from_numpy(batch).to(DEVICE).permute(0, 3, 1, 2).float().div_(255.0)
+    return img_tensor.sub_(NORM_MEAN).div_(NORM_STD)
+
+def predict_tensor_batch(batch: np.ndarray) -> List[Dict]:
+    """
+    Inference on an already validated batch from decode_tensor_payload.
+    
+    Args:
+        batch: uint8 array of shape (N, INPUT_SIZE, INPUT_SIZE, 3)
+    
+    Returns:
+        One prediction dictionary per image, same schema as predict_image_bytes
+    """
+    # Use real or mock inference
+    if MODEL is None:
+        return [_mock_predict(image_bytes=image.tobytes()) for image in batch]
+    
+    try:
+        img_tensor = preprocess_uint8_batch(batch)
+        return _run_model(img_tensor)
+    
+    except Exception as e:
+        print(f"✗ Error in predict_tensor_batch: {e}")
+        return [_mock_predict(notes=f"Error: {str(e)}") for _ in range(batch.shape[0])]
+
 def _mock_predict(image_bytes: Optional[bytes] = None, notes: str = "Using mock inference") -> Dict:
     """
     Generate deterministic mock prediction based on image or random seed.
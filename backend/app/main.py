@@ -1,19 +1,30 @@
 """
 FastAPI application for campus building classifier.
-Endpoints: /ping, /labels, /predict
+Endpoints: /ping, /labels, /predict, /predict/tensor, /ws/predict (WebSocket), /stats/scheduler, /admin/memory
 Production-ready with Grad-CAM support and mock inference fallback.
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, status
+from fastapi import FastAPI, File, UploadFile, HTTPException, Header, Request, WebSocket, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
 from datetime import datetime
+import asyncio
+import hmac
 import json
 import os
 
-from inference import initialize, predict_image_bytes, load_labels, LABELS
+from inference import (
+    initialize, predict_image_bytes, decode_tensor_payload, predict_tensor_batch,
+    load_labels, LABELS, MAX_TENSOR_PAYLOAD_BYTES
+)
+from diagnostics import (
+    memory_snapshot, start_tracemalloc, stop_tracemalloc, TRACEMALLOC_FRAMES, DEFAULT_TOP_ALLOCATORS
+)
+from scheduler import SCHEDULER, PRIORITIES, DEFAULT_PRIORITY, LoadShedError
+from utils import image_fingerprint, fingerprint_distance
 
 # ============================================================================
 # FastAPI App Setup
@@ -34,6 +45,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ============================================================================
+# Streaming Configuration
+# ============================================================================
+
+# Frames whose thumbnail differs from the last classified frame by less than
+# this mean pixel difference (0-1) are treated as duplicates and not re-run
+STREAM_SKIP_THRESHOLD = 0.02
+
+# Largest accepted WebSocket frame (encoded JPEG bytes)
+STREAM_MAX_FRAME_BYTES = 2 * 1024 * 1024
+
+# Admin endpoints are disabled (404) unless this is set; callers send it in X-Admin-Token
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
 # ============================================================================
 # Pydantic Models
 # ============================================================================
@@ -51,6 +76,11 @@ class PredictionResponse(BaseModel):
     notes: str                               # Info about inference (real/mock)
     gradcam_base64: Optional[str] = None    # Grad-CAM visualization (if available)
 
+class BatchPredictionResponse(BaseModel):
+    """Response schema for /predict/tensor endpoint."""
+    results: List[PredictionResponse]       # One prediction per image in the batch
+    count: int
+
 class LabelsResponse(BaseModel):
     """Response schema for /labels endpoint."""
     labels: List[str]
@@ -70,8 +100,16 @@ async def startup_event():
     print("APPLICATION STARTUP")
     print("="*70)
     initialize()
+    SCHEDULER.start()
+    if TRACEMALLOC_FRAMES > 0:
+        start_tracemalloc(TRACEMALLOC_FRAMES)
     print("="*70 + "\n")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the inference scheduler and fail any queued requests."""
+    await SCHEDULER.stop()
+
 # ============================================================================
 # Endpoints
 # ============================================================================
@@ -104,8 +142,56 @@ async def get_labels():
             detail=f"Error fetching labels: {str(e)}"
         )
 
+@app.get("/stats/scheduler")
+async def scheduler_stats():
+    """
+    Inference scheduler statistics.
+    
+    Returns:
+        Shed counts, deadlines met/missed, queue depth and service time estimate
+    """
+    return SCHEDULER.stats()
+
+@app.get("/admin/memory")
+async def admin_memory(
+    top: int = DEFAULT_TOP_ALLOCATORS,
+    start_tracing: bool = False,
+    stop_tracing: bool = False,
+    x_admin_token: Optional[str] = Header(None)
+):
+    """
+    Live memory snapshot for leak hunting and soak tests.
+    
+    - RSS, open file descriptors, GC counts
+    - tracemalloc top allocation sites (if tracing; see TRACEMALLOC_FRAMES)
+    - glibc malloc / CUDA allocator statistics
+    
+    Args:
+        top: Number of allocation sites to return
+        start_tracing: Start tracemalloc now if it is not running
+        stop_tracing: Stop tracemalloc after taking this snapshot
+        x_admin_token: Must match the ADMIN_TOKEN env var
+    
+    Returns:
+        Memory snapshot dictionary (404 if ADMIN_TOKEN is unset, 403 on a bad token)
+    """
+    _require_admin(x_admin_token)
+    
+    if start_tracing:
+        start_tracemalloc(max(1, TRACEMALLOC_FRAMES))
+    
+    snapshot = await run_in_threadpool(memory_snapshot, max(0, top))
+    if stop_tracing:
+        stop_tracemalloc()
+        snapshot["tracemalloc"]["tracing"] = False
+    return snapshot
+
 @app.post("/predict", response_model=PredictionResponse)
-async def predict(file: UploadFile = File(...)):
+async def predict(
+    file: UploadFile = File(...),
+    x_priority: Optional[str] = Header(None),
+    x_deadline_ms: Optional[str] = Header(None)
+):
     """
     Predict building class from uploaded image.
     
@@ -113,9 +199,12 @@ async def predict(file: UploadFile = File(...)):
     - Returns top-5 predictions with confidence scores
     - Falls back to mock inference if model not available
     - Optionally includes Grad-CAM visualization
+    - Returns 503 if the request is shed (deadline cannot be met, queue full)
     
     Args:
         file: Image file (multipart/form-data)
+        x_priority: "interactive" (default) or "bulk"
+        x_deadline_ms: Time budget in milliseconds; work is dropped once it cannot finish in time
     
     Returns:
         PredictionResponse with predictions and optional Grad-CAM
@@ -140,6 +229,8 @@ async def predict(file: UploadFile = File(...)):
             detail=f"Unsupported file type: {file_ext}. Allowed: {allowed_types}"
         )
     
+    priority, deadline_ms = _parse_scheduling_headers(x_priority, x_deadline_ms)
+    
     try:
         # Read image bytes
         image_bytes = await file.read()
@@ -151,27 +242,17 @@ async def predict(file: UploadFile = File(...)):
             )
         
         # Run inference
-        result = predict_image_bytes(image_bytes)
-        
-        # Convert to response format
-        probs_list = [
-            PredictionProbability(
-                class_name=p["class"],
-                confidence=p["confidence"]
-            )
-            for p in result.get("probs", [])
-        ]
-        
-        return PredictionResponse(
-            pred=result["pred"],
-            confidence=result["confidence"],
-            probs=probs_list,
-            notes=result.get("notes", ""),
-            gradcam_base64=result.get("gradcam_base64", None)
+        result = await SCHEDULER.submit(
+            predict_image_bytes, image_bytes,
+            priority=priority, deadline_ms=deadline_ms
         )
+        
+        return _to_prediction_response(result)
     
     except HTTPException:
         raise
+    except LoadShedError as e:
+        raise _shed_exception(e)
     except Exception as e:
         print(f"[ERROR] Prediction failed: {e}")
         raise HTTPException(
@@ -179,6 +260,294 @@ async def predict(file: UploadFile = File(...)):
             detail=f"Prediction error: {str(e)}"
         )
 
+@app.post("/predict/tensor", response_model=BatchPredictionResponse)
+async def predict_tensor(
+    request: Request,
+    x_tensor_shape: Optional[str] = Header(None),
+    x_priority: Optional[str] = Header(None),
+    x_deadline_ms: Optional[str] = Header(None)
+):
+    """
+    Predict building classes from pre-decoded uint8 RGB images.
+    
+    For clients that already resize to 224x224 on device: skips server-side
+    image decoding and resizing, only normalization is applied.
+    
+    - Body: raw uint8 bytes (application/octet-stream) with X-Tensor-Shape
+      header, or a NumPy .npy file (application/x-npy)
+    - Shape: HWC (224,224,3) or NHWC (N,224,224,3), N <= 32
+    - Bodies larger than a full batch are rejected with 413
+    
+    Args:
+        request: Raw request (binary body)
+        x_tensor_shape: Comma-separated shape for raw payloads, e.g. "1,224,224,3"
+        x_priority: "interactive" (default) or "bulk"
+        x_deadline_ms: Time budget in milliseconds
+    
+    Returns:
+        BatchPredictionResponse with one prediction per image
+    
+    Example:
+        curl -X POST "http://localhost:8000/predict/tensor" \\
+            -H "Content-Type: application/x-npy" \\
+            --data-binary @batch.npy
+    """
+    payload = await _read_body_limited(request, MAX_TENSOR_PAYLOAD_BYTES)
+    if not payload:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Empty body"
+        )
+    
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    shape = _parse_tensor_shape(x_tensor_shape) if x_tensor_shape else None
+    priority, deadline_ms = _parse_scheduling_headers(x_priority, x_deadline_ms)
+    
+    # Validate before queueing so bad payloads never take a scheduler slot
+    try:
+        batch = decode_tensor_payload(payload, shape, content_type)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid tensor payload: {str(e)}"
+        )
+    
+    try:
+        results = await SCHEDULER.submit(
+            predict_tensor_batch, batch,
+            priority=priority, deadline_ms=deadline_ms, cost=batch.shape[0]
+        )
+    except LoadShedError as e:
+        raise _shed_exception(e)
+    except Exception as e:
+        print(f"[ERROR] Tensor prediction failed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Prediction error: {str(e)}"
+        )
+    
+    return BatchPredictionResponse(
+        results=[_to_prediction_response(r) for r in results],
+        count=len(results)
+    )
+
+@app.websocket("/ws/predict")
+async def predict_stream(websocket: WebSocket):
+    """
+    Stream classification for live camera feeds.
+    
+    - Client sends JPEG frames as binary messages
+    - Frame IDs are assigned in arrival order, starting at 0
+    - If inference falls behind, only the newest waiting frame is kept
+    - Frames nearly identical to the last classified frame are not re-run;
+      the previous prediction is returned with "skipped": true
+    - Frames that cannot be decoded get {"frame_id", "error"} and are not classified
+    - Frames go through the shared scheduler at interactive priority; each
+      stream queues at most one frame, so streams take turns
+    
+    Each result message is JSON:
+        {"frame_id": 7, "skipped": false, "source_frame_id": 7,
+         "pred": "CSE Building", "confidence": 0.89, "probs": [...],
+         "notes": "...", "gradcam_base64": null, "dropped": 2}
+    
+    Example (JavaScript):
+        const ws = new WebSocket("ws://localhost:8000/ws/predict");
+        ws.onmessage = (e) => console.log(JSON.parse(e.data));
+        ws.send(jpegBlob);
+    """
+    await websocket.accept()
+    
+    latest: Dict = {}               # Newest unprocessed frame: {"frame_id", "data"}
+    frame_ready = asyncio.Event()
+    counters = {"dropped": 0}
+    
+    async def receive_frames():
+        frame_id = 0
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            
+            data = message.get("bytes")
+            if not data:
+                continue  # Ignore text/keepalive messages
+            
+            if len(data) > STREAM_MAX_FRAME_BYTES:
+                await websocket.send_json({
+                    "frame_id": frame_id,
+                    "error": f"Frame too large: {len(data)} bytes (max {STREAM_MAX_FRAME_BYTES})"
+                })
+            else:
+                if latest:
+                    counters["dropped"] += 1  # Inference is behind; replace stale frame
+                latest["frame_id"] = frame_id
+                latest["data"] = data
+                frame_ready.set()
+            frame_id += 1
+    
+    async def classify_frames():
+        last_fingerprint = None
+        last_response: Dict = {}
+        while True:
+            await frame_ready.wait()
+            frame_ready.clear()
+            frame_id, data = latest.pop("frame_id"), latest.pop("data")
+            
+            fingerprint = await run_in_threadpool(image_fingerprint, data)
+            if fingerprint is None:
+                # Undecodable frame: report it instead of returning a mock label
+                await websocket.send_json({
+                    "frame_id": frame_id,
+                    "error": "Could not decode frame as an image"
+                })
+                continue
+            
+            if (
+                last_fingerprint is not None
+                and fingerprint_distance(fingerprint, last_fingerprint) < STREAM_SKIP_THRESHOLD
+            ):
+                await websocket.send_json({
+                    **last_response,
+                    "frame_id": frame_id,
+                    "skipped": True,
+                    "dropped": counters["dropped"]
+                })
+                continue
+            
+            try:
+                result = await SCHEDULER.submit(predict_image_bytes, data, priority="interactive")
+            except LoadShedError as e:
+                await websocket.send_json({"frame_id": frame_id, "error": str(e), "shed": e.reason})
+                continue
+            
+            last_fingerprint = fingerprint
+            last_response = {
+                **_to_prediction_response(result).model_dump(),
+                "source_frame_id": frame_id
+            }
+            await websocket.send_json({
+                **last_response,
+                "frame_id": frame_id,
+                "skipped": False,
+                "dropped": counters["dropped"]
+            })
+    
+    tasks = [asyncio.create_task(receive_frames()), asyncio.create_task(classify_frames())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        # asyncio.wait (not gather) so cancelling this handler can't be
+        # absorbed by the child tasks' cancellation
+        await asyncio.wait(tasks)
+        for task in tasks:
+            if not task.cancelled():
+                task.exception()  # Retrieve expected send-after-disconnect errors
+
+# ============================================================================
+# Helpers
+# ============================================================================
+
+def _require_admin(x_admin_token: Optional[str]):
+    """Fail closed: admin endpoints exist only when ADMIN_TOKEN is configured."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(
+        x_admin_token.encode(), ADMIN_TOKEN.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid admin token"
+        )
+
+def _to_prediction_response(result: Dict) -> PredictionResponse:
+    """Convert an inference result dictionary to the API response schema."""
+    probs_list = [
+        PredictionProbability(
+            class_name=p["class"],
+            confidence=p["confidence"]
+        )
+        for p in result.get("probs", [])
+    ]
+    
+    return PredictionResponse(
+        pred=result["pred"],
+        confidence=result["confidence"],
+        probs=probs_list,
+        notes=result.get("notes", ""),
+        gradcam_base64=result.get("gradcam_base64", None)
+    )
+
+def _parse_scheduling_headers(
+    x_priority: Optional[str],
+    x_deadline_ms: Optional[str]
+) -> Tuple[str, Optional[float]]:
+    """Validate X-Priority / X-Deadline-Ms headers."""
+    priority = (x_priority or DEFAULT_PRIORITY).strip().lower()
+    if priority not in PRIORITIES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid X-Priority: {x_priority!r}. Allowed: {list(PRIORITIES)}"
+        )
+    
+    deadline_ms = None
+    if x_deadline_ms is not None:
+        try:
+            deadline_ms = float(x_deadline_ms)
+        except ValueError:
+            deadline_ms = -1.0
+        if not deadline_ms > 0:  # Also rejects NaN
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid X-Deadline-Ms: {x_deadline_ms!r}"
+            )
+    return priority, deadline_ms
+
+def _shed_exception(e: LoadShedError) -> HTTPException:
+    """503 response for a request dropped by the scheduler."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=f"Request shed: {str(e)}",
+        headers={"X-Shed-Reason": e.reason}
+    )
+
+async def _read_body_limited(request: Request, limit: int) -> bytearray:
+    """
+    Read the request body into a writable buffer, rejecting bodies over limit (413).
+    
+    Checks Content-Length up front and also counts streamed bytes, so chunked
+    uploads without a length cannot exceed the limit either.
+    """
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Body too large (max {limit} bytes)"
+    )
+    
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > limit:
+        raise too_large
+    
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > limit:
+            raise too_large
+    return body
+
+def _parse_tensor_shape(header_value: str) -> Tuple[int, ...]:
+    """Parse an X-Tensor-Shape header such as "1,224,224,3"."""
+    try:
+        shape = tuple(int(dim) for dim in header_value.split(","))
+    except ValueError:
+        shape = ()
+    if not shape or any(dim <= 0 for dim in shape):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid X-Tensor-Shape header: {header_value!r}"
+        )
+    return shape
+
 # ============================================================================
 # Error Handlers
 # ============================================================================
@@ -0,0 +1,362 @@
+"""
+Deadline-aware inference scheduling and load shedding.
+Runs model work one job at a time: interactive before bulk, FIFO within a priority.
+Drops queued work whose deadline has passed or cannot be met.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Priority classes (lower value runs first)
+PRIORITIES = {
+    "interactive": 0,
+    "bulk": 1,
+}
+DEFAULT_PRIORITY = "interactive"
+
+# Moving estimate of service time per unit of cost (one image), as an
+# exponentially weighted moving average kept separately for each function
+# (an upload needs a full decode, a pre-decoded tensor does not)
+SERVICE_TIME_ALPHA = 0.2           # Weight of the newest sample
+INITIAL_SERVICE_TIME_S = 0.05      # Per-unit estimate used before a function has finished once
+
+# Upper bound on queued jobs; beyond this new work is shed immediately
+MAX_QUEUE_DEPTH = 256
+
+# Lower-priority jobs waiting longer than this are promoted to the top
+# priority (keeping their arrival order), so a steady stream of interactive
+# traffic (e.g. WebSocket camera feeds) cannot starve bulk work forever
+MAX_PRIORITY_WAIT_S = 5.0
+
+
+class LoadShedError(Exception):
+    """Raised when a job is dropped instead of being run."""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class _Job:
+    """A queued unit of work and the future its caller is waiting on."""
+
+    __slots__ = ("fn", "args", "priority", "cost", "deadline", "enqueued", "future", "timer")
+
+    def __init__(self, fn: Callable, args: tuple, priority: int, cost: int,
+                 deadline: Optional[float], future: asyncio.Future):
+        self.fn = fn
+        self.args = args
+        self.priority = priority    # Requested priority (queue entry may be promoted)
+        self.cost = cost
+        self.deadline = deadline    # time.monotonic() value, or None
+        self.enqueued = time.monotonic()
+        self.future = future
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class InferenceScheduler:
+    """
+    Priority queue in front of the model with deadline-based load shedding.
+
+    A single worker runs jobs in a thread so the event loop stays free.
+    A job is shed when:
+    - it is submitted while the queue is full,
+    - its deadline cannot be met given the work ahead of it, or
+    - while queued, its deadline can no longer be met even if it started now
+      (a per-job timer fires the 503 on time, not when the job reaches the front).
+
+    Lower-priority jobs are promoted after MAX_PRIORITY_WAIT_S in the queue.
+    """
+
+    def __init__(self):
+        self._queue: List = []      # Heap of (level, seq, job)
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._service_times: Dict[str, float] = {}     # Per-unit EWMA by function name
+        self._in_flight: Optional[_Job] = None
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "shed_queue_full": 0,
+            "shed_unmeetable": 0,
+            "shed_expired": 0,
+            "deadlines_met": 0,
+            "deadlines_missed": 0,
+            "promoted": 0,
+        }
+
+    # ------------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------------
+
+    def start(self):
+        """Start the worker task. Call from the running event loop."""
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the worker and fail the running job and any jobs still queued."""
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+        if self._in_flight is not None:
+            self._fail(self._in_flight, LoadShedError("shutdown", "Server shutting down"))
+            self._in_flight = None
+        while self._queue:
+            job = heapq.heappop(self._queue)[-1]
+            self._fail(job, LoadShedError("shutdown", "Server shutting down"))
+
+    # ------------------------------------------------------------------------
+    # Submission
+    # ------------------------------------------------------------------------
+
+    async def submit(self, fn: Callable, *args,
+                     priority: str = DEFAULT_PRIORITY,
+                     deadline_ms: Optional[float] = None,
+                     cost: int = 1) -> Any:
+        """
+        Queue fn(*args) and wait for its result.
+
+        Args:
+            fn: Blocking function to run (e.g. predict_image_bytes)
+            *args: Positional arguments for fn
+            priority: "interactive" or "bulk"
+            deadline_ms: Time budget from now in milliseconds, or None for no deadline
+            cost: Relative amount of work, e.g. number of images in a batch
+
+        Returns:
+            Return value of fn
+
+        Raises:
+            LoadShedError: If the job was dropped
+            ValueError: If priority or cost is invalid
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}. Allowed: {list(PRIORITIES)}")
+        if cost < 1:
+            raise ValueError(f"Cost must be at least 1, got {cost}")
+        self.start()
+
+        level = PRIORITIES[priority]
+        now = time.monotonic()
+        deadline = now + deadline_ms / 1000.0 if deadline_ms is not None else None
+        self._stats["submitted"] += 1
+
+        if len(self._queue) >= MAX_QUEUE_DEPTH:
+            self._stats["shed_queue_full"] += 1
+            raise LoadShedError("queue_full", f"Queue full ({MAX_QUEUE_DEPTH} jobs)")
+
+        if deadline is not None:
+            # Work ahead of this job: everything queued at the same or higher
+            # priority (including overdue jobs that will be promoted), the job
+            # in flight, and the job itself
+            self._promote_waiting(now)
+            ahead = sum(self._job_time(entry[-1]) for entry in self._queue if entry[0] <= level)
+            in_flight = self._job_time(self._in_flight) if self._in_flight is not None else 0.0
+            expected_finish = now + ahead + in_flight + self._estimate(fn) * cost
+            if expected_finish > deadline:
+                self._stats["shed_unmeetable"] += 1
+                raise LoadShedError(
+                    "unmeetable",
+                    f"Deadline of {deadline_ms:.0f} ms cannot be met "
+                    f"(estimated {(expected_finish - now) * 1000:.0f} ms)"
+                )
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        job = _Job(fn, args, level, cost, deadline, future)
+        heapq.heappush(self._queue, (level, next(self._seq), job))
+        if deadline is not None:
+            self._arm_expiry(job)
+        self._wakeup.set()
+        try:
+            return await future
+        finally:
+            if job.timer is not None:
+                job.timer.cancel()
+                job.timer = None
+            if future.cancelled():
+                # Caller went away (e.g. WebSocket closed): free the queue slot now
+                self._remove(job)
+
+    # ------------------------------------------------------------------------
+    # Service time estimates
+    # ------------------------------------------------------------------------
+
+    def _estimate(self, fn: Callable) -> float:
+        """Per-unit service time estimate for fn in seconds."""
+        return self._service_times.get(_fn_name(fn), INITIAL_SERVICE_TIME_S)
+
+    def _job_time(self, job: _Job) -> float:
+        """Estimated service time of job in seconds."""
+        return self._estimate(job.fn) * job.cost
+
+    def _record(self, job: _Job, elapsed: float, result: Any):
+        """Update fn's EWMA, ignoring fast fallback results that skipped the model."""
+        if _is_fallback_result(result):
+            return
+        estimate = self._estimate(job.fn)
+        per_unit = elapsed / job.cost
+        self._service_times[_fn_name(job.fn)] = estimate + SERVICE_TIME_ALPHA * (per_unit - estimate)
+
+    # ------------------------------------------------------------------------
+    # Queue maintenance
+    # ------------------------------------------------------------------------
+
+    def _arm_expiry(self, job: _Job):
+        """Schedule shedding for the moment job can no longer finish by its deadline."""
+        latest_start = job.deadline - self._job_time(job)
+        job.timer = asyncio.get_running_loop().call_later(
+            max(0.0, latest_start - time.monotonic()), self._expire, job
+        )
+
+    def _expire(self, job: _Job):
+        """Timer callback: shed job if it is still queued and can't make its deadline."""
+        job.timer = None
+        if job.future.done():
+            return  # Caller went away
+        if time.monotonic() + self._job_time(job) <= job.deadline:
+            self._arm_expiry(job)  # Service estimate dropped since the timer was armed
+            return
+        if not self._remove(job):
+            return  # Already running or finished
+        self._stats["shed_expired"] += 1
+        self._fail(job, LoadShedError("expired", "Deadline cannot be met while queued"))
+
+    def _remove(self, job: _Job) -> bool:
+        """Remove job from the queue; returns False if it was not queued."""
+        for i, entry in enumerate(self._queue):
+            if entry[-1] is job:
+                self._queue[i] = self._queue[-1]
+                self._queue.pop()
+                heapq.heapify(self._queue)
+                return True
+        return False
+
+    def _promote_waiting(self, now: float):
+        """Move jobs queued longer than MAX_PRIORITY_WAIT_S to the top priority."""
+        top = min(PRIORITIES.values())
+        promoted = False
+        for i, (level, seq, job) in enumerate(self._queue):
+            if level != top and now - job.enqueued >= MAX_PRIORITY_WAIT_S:
+                # Keep the original sequence number: it runs ahead of newer work
+                self._queue[i] = (top, seq, job)
+                self._stats["promoted"] += 1
+                promoted = True
+        if promoted:
+            heapq.heapify(self._queue)
+
+    @staticmethod
+    def _fail(job: _Job, exc: Exception):
+        if job.timer is not None:
+            job.timer.cancel()
+            job.timer = None
+        if not job.future.done():
+            job.future.set_exception(exc)
+
+    # ------------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------------
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            self._promote_waiting(time.monotonic())
+            job = heapq.heappop(self._queue)[-1]
+            if job.timer is not None:
+                job.timer.cancel()
+                job.timer = None
+            if job.future.done():
+                continue  # Caller went away (e.g. client disconnected)
+
+            started = time.monotonic()
+            if job.deadline is not None and started + self._job_time(job) > job.deadline:
+                self._stats["shed_expired"] += 1
+                self._fail(job, LoadShedError("expired", "Deadline cannot be met while queued"))
+                continue
+
+            self._in_flight = job
+            try:
+                result = await loop.run_in_executor(None, job.fn, *job.args)
+            except Exception as e:
+                self._in_flight = None
+                self._stats["failed"] += 1
+                self._fail(job, e)
+                continue
+            self._in_flight = None
+
+            finished = time.monotonic()
+            self._record(job, finished - started, result)
+            self._stats["completed"] += 1
+            if job.deadline is not None:
+                if finished <= job.deadline:
+                    self._stats["deadlines_met"] += 1
+                else:
+                    self._stats["deadlines_missed"] += 1
+
+            if not job.future.done():
+                job.future.set_result(result)
+
+    # ------------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------------
+
+    def stats(self) -> Dict:
+        """Counters, queue depth per priority and the current service time estimate."""
+        queued = {name: 0 for name in PRIORITIES}
+        names = {level: name for name, level in PRIORITIES.items()}
+        for entry in self._queue:
+            queued[names[entry[-1].priority]] += 1
+
+        shed = (
+            self._stats["shed_queue_full"]
+            + self._stats["shed_unmeetable"]
+            + self._stats["shed_expired"]
+        )
+        return {
+            **self._stats,
+            "shed_total": shed,
+            "queued": queued,
+            "in_flight": int(self._in_flight is not None),
+            "service_time_per_image_ms": {
+                name: round(seconds * 1000, 2) for name, seconds in self._service_times.items()
+            },
+        }
+
+
+def _fn_name(fn: Callable) -> str:
+    return getattr(fn, "__name__", repr(fn))
+
+
+def _is_fallback_result(result: Any) -> bool:
+    """
+    True for inference results produced by the error fallback (notes "Error: ...").
+
+    These return a mock prediction in microseconds (e.g. a corrupt upload) and
+    would drag the service time estimate down.
+    """
+    results = result if isinstance(result, list) else [result]
+    return any(
+        isinstance(r, dict) and str(r.get("notes", "")).startswith("Error")
+        for r in results
+    )
+
+
+# Shared by all endpoints
+SCHEDULER = InferenceScheduler()
@@ -8,6 +8,7 @@ import tempfile
 from fastapi import UploadFile
 from pathlib import Path
 from PIL import Image
+import numpy as np
 import base64
 from io import BytesIO
 from typing import Optional, Tuple
@@ -192,6 +193,42 @@ def get_image_info(image: Image.Image) -> dict:
         "format": image.format or "Unknown"
     }
 
+def image_fingerprint(image_bytes: bytes, size: int = 16) -> Optional[np.ndarray]:
+    """
+    Compute a small grayscale thumbnail for near-duplicate frame detection.
+    
+    JPEG frames are decoded at reduced scale (PIL draft mode), so this is
+    much cheaper than a full decode.
+    
+    Args:
+        image_bytes: Encoded image bytes
+        size: Thumbnail width and height
+    
+    Returns:
+        float32 array of shape (size, size) or None if decoding failed
+    """
+    try:
+        with Image.open(BytesIO(image_bytes)) as img:
+            img.draft("L", (size * 4, size * 4))
+            thumb = img.convert("L").resize((size, size))
+        return np.asarray(thumb, dtype=np.float32)
+    except Exception as e:
+        print(f"Error computing image fingerprint: {e}")
+        return None
+
+def fingerprint_distance(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    Mean absolute pixel difference between two fingerprints.
+    
+    Args:
+        a: Fingerprint from image_fingerprint()
+        b: Fingerprint from image_fingerprint()
+    
+    Returns:
+        Distance in [0, 1]; 0 means identical thumbnails
+    """
+    return float(np.abs(a - b).mean() / 255.0)
+
 # ============================================================================
 # Base64 & Encoding Utilities
 # ============================================================================
@@ -0,0 +1,363 @@
+"""
+Soak test for the Campus Building Classifier API.
+
+Replays a mixed workload (HTTP requests plus /ws/predict streams that
+connect, send frames and disconnect repeatedly) against a running server
+for hours while sampling the server's memory through /admin/memory (RSS,
+open files, tracemalloc top allocators, allocator statistics). Fails if
+RSS grows faster than a configured slope after warm-up.
+
+Usage:
+    # Start the server with the admin endpoint enabled and tracing on
+    cd app && ADMIN_TOKEN=secret TRACEMALLOC_FRAMES=1 uvicorn main:app --port 8000
+
+    # Run a 4 hour soak with 4 client threads
+    ADMIN_TOKEN=secret python soak.py --url http://localhost:8000 --duration 14400 --workers 4
+
+If the server was not already tracing, the harness starts tracemalloc and
+stops it again at the end of the run.
+
+Exit code is 0 on pass, 1 if memory grew past --max-slope-mb-per-hour.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import requests
+from PIL import Image
+from websockets.sync.client import connect as ws_connect
+
+INPUT_SIZE = 224
+
+# Relative weights of each request type in the replayed workload
+WORKLOAD_MIX = {
+    "predict_jpeg": 45,
+    "predict_png": 10,
+    "predict_bulk": 10,
+    "predict_tensor_npy": 10,
+    "predict_tensor_raw": 5,
+    "labels": 10,
+    "ping": 5,
+    "invalid": 5,
+}
+
+# WebSocket stream clients: what each connection does before it closes
+STREAM_FRAMES_PER_CONNECTION = 20
+STREAM_BURST_PROBABILITY = 0.2         # Send several frames at once (exercises frame dropping)
+STREAM_REPEAT_PROBABILITY = 0.3        # Resend the previous frame (exercises duplicate skipping)
+STREAM_GARBAGE_PROBABILITY = 0.05      # Undecodable frame (exercises the error path)
+STREAM_ABANDON_PROBABILITY = 0.3       # Close with a frame still in flight (exercises cancellation)
+
+# ============================================================================
+# Workload
+# ============================================================================
+
+def _encode(image: Image.Image, fmt: str, **kwargs) -> bytes:
+    with BytesIO() as buffer:
+        image.save(buffer, format=fmt, **kwargs)
+        return buffer.getvalue()
+
+def build_payloads(seed: int) -> Dict[str, List[bytes]]:
+    """
+    Generate a fixed pool of request bodies of varying size.
+
+    Args:
+        seed: Random seed so runs replay the same workload
+
+    Returns:
+        Dictionary of payload lists keyed by kind
+    """
+    rng = np.random.default_rng(seed)
+    payloads = {"jpeg": [], "png": [], "npy": [], "raw": [], "frames": []}
+
+    for width, height in [(320, 240), (640, 480), (1280, 960), (1920, 1080), (224, 224)]:
+        pixels = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+        with Image.fromarray(pixels) as image:
+            payloads["jpeg"].append(_encode(image, "JPEG", quality=85))
+            payloads["png"].append(_encode(image, "PNG"))
+
+    # Camera-like frames that differ visibly after downscaling (noise images all
+    # shrink to the same grey thumbnail and would be skipped as duplicates)
+    ys, xs = np.mgrid[0:480, 0:640]
+    for i in range(8):
+        color = rng.integers(0, 256, size=3)
+        gradient = ((xs * np.cos(i) + ys * np.sin(i)) % 256)[..., None]
+        pixels = ((gradient + color) % 256).astype(np.uint8)
+        with Image.fromarray(pixels) as image:
+            payloads["frames"].append(_encode(image, "JPEG", quality=80))
+
+    for batch_size in (1, 4, 8):
+        batch = rng.integers(0, 256, size=(batch_size, INPUT_SIZE, INPUT_SIZE, 3), dtype=np.uint8)
+        with BytesIO() as buffer:
+            np.save(buffer, batch)
+            payloads["npy"].append(buffer.getvalue())
+        payloads["raw"].append(batch.tobytes())
+
+    return payloads
+
+def send_request(session: requests.Session, url: str, kind: str,
+                 payloads: Dict[str, List[bytes]], timeout: float) -> int:
+    """
+    Send one request of the given kind.
+
+    Returns:
+        HTTP status code
+    """
+    if kind == "ping":
+        response = session.get(f"{url}/ping", timeout=timeout)
+    elif kind == "labels":
+        response = session.get(f"{url}/labels", timeout=timeout)
+    elif kind in ("predict_jpeg", "predict_bulk"):
+        headers = {"X-Priority": "bulk"} if kind == "predict_bulk" else {"X-Deadline-Ms": "2000"}
+        files = {"file": ("frame.jpg", random.choice(payloads["jpeg"]), "image/jpeg")}
+        response = session.post(f"{url}/predict", files=files, headers=headers, timeout=timeout)
+    elif kind == "predict_png":
+        files = {"file": ("frame.png", random.choice(payloads["png"]), "image/png")}
+        response = session.post(f"{url}/predict", files=files, timeout=timeout)
+    elif kind == "predict_tensor_npy":
+        response = session.post(
+            f"{url}/predict/tensor", data=random.choice(payloads["npy"]),
+            headers={"Content-Type": "application/x-npy"}, timeout=timeout
+        )
+    elif kind == "predict_tensor_raw":
+        body = random.choice(payloads["raw"])
+        batch_size = len(body) // (INPUT_SIZE * INPUT_SIZE * 3)
+        response = session.post(
+            f"{url}/predict/tensor", data=body,
+            headers={
+                "Content-Type": "application/octet-stream",
+                "X-Tensor-Shape": f"{batch_size},{INPUT_SIZE},{INPUT_SIZE},3",
+            },
+            timeout=timeout
+        )
+    else:
+        # Corrupt image: exercises the error paths
+        files = {"file": ("broken.jpg", b"\xff\xd8not-a-jpeg", "image/jpeg")}
+        response = session.post(f"{url}/predict", files=files, timeout=timeout)
+
+    response.close()
+    return response.status_code
+
+def run_client(url: str, payloads: Dict[str, List[bytes]], stop: threading.Event,
+               results: Counter, lock: threading.Lock, timeout: float):
+    """Send weighted-random requests until stop is set."""
+    kinds = list(WORKLOAD_MIX)
+    weights = list(WORKLOAD_MIX.values())
+    with requests.Session() as session:
+        while not stop.is_set():
+            kind = random.choices(kinds, weights)[0]
+            try:
+                outcome = str(send_request(session, url, kind, payloads, timeout))
+            except requests.RequestException as e:
+                outcome = type(e).__name__
+            with lock:
+                results[f"{kind}:{outcome}"] += 1
+
+def run_stream_client(url: str, payloads: Dict[str, List[bytes]], stop: threading.Event,
+                      results: Counter, lock: threading.Lock, timeout: float):
+    """Open /ws/predict, stream frames, disconnect, and repeat until stop is set."""
+    ws_url = "ws" + url[len("http"):] + "/ws/predict"
+
+    def record(outcome: str):
+        with lock:
+            results[f"stream:{outcome}"] += 1
+
+    while not stop.is_set():
+        try:
+            with ws_connect(ws_url, open_timeout=timeout, close_timeout=timeout,
+                            max_size=None) as ws:
+                record("connect")
+                frame = random.choice(payloads["frames"])
+                sent = 0
+                while sent < STREAM_FRAMES_PER_CONNECTION and not stop.is_set():
+                    burst = random.randint(2, 4) if random.random() < STREAM_BURST_PROBABILITY else 1
+                    for _ in range(burst):
+                        if random.random() < STREAM_GARBAGE_PROBABILITY:
+                            frame = b"not-a-jpeg"
+                        elif random.random() >= STREAM_REPEAT_PROBABILITY:
+                            frame = random.choice(payloads["frames"])
+                        ws.send(frame)
+                        sent += 1
+
+                    # Frames in a burst may be dropped; wait for the newest one
+                    last_id = sent - 1
+                    while True:
+                        message = json.loads(ws.recv(timeout=timeout))
+                        if "error" in message:
+                            record("error")
+                        else:
+                            record("skipped" if message.get("skipped") else "classified")
+                        if message.get("frame_id") == last_id:
+                            break
+
+                if random.random() < STREAM_ABANDON_PROBABILITY:
+                    ws.send(random.choice(payloads["frames"]))
+                    record("abandoned")
+        except Exception as e:
+            record(type(e).__name__)
+
+# ============================================================================
+# Sampling & Analysis
+# ============================================================================
+
+def fetch_snapshot(url: str, admin_token: Optional[str], top: int,
+                   start_tracing: bool = False, stop_tracing: bool = False) -> Optional[Dict]:
+    """Fetch /admin/memory from the server, or None on failure."""
+    headers = {"X-Admin-Token": admin_token} if admin_token else {}
+    params = {
+        "top": top,
+        "start_tracing": str(start_tracing).lower(),
+        "stop_tracing": str(stop_tracing).lower(),
+    }
+    try:
+        response = requests.get(f"{url}/admin/memory", params=params, headers=headers, timeout=30)
+        response.raise_for_status()
+        return response.json()
+    except requests.RequestException as e:
+        print(f"[Soak] Snapshot failed: {e}")
+        return None
+
+def rss_slope_mb_per_hour(samples: List[Tuple[float, int]]) -> Optional[float]:
+    """
+    Least-squares slope of RSS over time.
+
+    Args:
+        samples: (elapsed_seconds, rss_bytes) pairs
+
+    Returns:
+        Slope in MB/hour, or None with fewer than 3 samples
+    """
+    if len(samples) < 3:
+        return None
+    hours = np.array([t for t, _ in samples]) / 3600.0
+    rss_mb = np.array([r for _, r in samples]) / (1024 * 1024)
+    if np.ptp(hours) == 0:
+        return None
+    slope, _ = np.polyfit(hours, rss_mb, 1)
+    return float(slope)
+
+# ============================================================================
+# Main
+# ============================================================================
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Soak test with memory-growth tracking")
+    parser.add_argument("--url", default="http://localhost:8000", help="Server base URL")
+    parser.add_argument("--duration", type=float, default=4 * 3600, help="Test length in seconds")
+    parser.add_argument("--interval", type=float, default=60, help="Seconds between memory samples")
+    parser.add_argument("--warmup", type=float, default=600,
+                        help="Seconds excluded from the slope (model/allocator warm-up)")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent client threads")
+    parser.add_argument("--stream-workers", type=int, default=2,
+                        help="Concurrent /ws/predict clients (connect, stream, disconnect)")
+    parser.add_argument("--max-slope-mb-per-hour", type=float, default=5.0,
+                        help="Fail if post-warm-up RSS grows faster than this")
+    parser.add_argument("--top", type=int, default=10, help="Allocation sites per sample")
+    parser.add_argument("--timeout", type=float, default=30, help="Per-request timeout in seconds")
+    parser.add_argument("--admin-token", default=os.environ.get("ADMIN_TOKEN"),
+                        help="X-Admin-Token for /admin/memory (default: $ADMIN_TOKEN)")
+    parser.add_argument("--output", default="soak_samples.jsonl", help="JSONL file for samples")
+    parser.add_argument("--seed", type=int, default=0, help="Workload random seed")
+    args = parser.parse_args()
+
+    url = args.url.rstrip("/")
+    random.seed(args.seed)
+    payloads = build_payloads(args.seed)
+
+    initial = fetch_snapshot(url, args.admin_token, 0)
+    if initial is None:
+        print(f"[Soak] Cannot reach {url}/admin/memory (is ADMIN_TOKEN set on both sides?)")
+        return 1
+    started_tracing = not initial["tracemalloc"]["tracing"]
+    if started_tracing:
+        fetch_snapshot(url, args.admin_token, 0, start_tracing=True)
+
+    stop = threading.Event()
+    results: Counter = Counter()
+    lock = threading.Lock()
+    clients = [
+        threading.Thread(
+            target=target, args=(url, payloads, stop, results, lock, args.timeout), daemon=True
+        )
+        for target, count in ((run_client, args.workers), (run_stream_client, args.stream_workers))
+        for _ in range(count)
+    ]
+    for client in clients:
+        client.start()
+
+    print(f"[Soak] {args.workers} HTTP + {args.stream_workers} stream workers "
+          f"against {url} for {args.duration:.0f}s "
+          f"(sample every {args.interval:.0f}s, warm-up {args.warmup:.0f}s)")
+
+    rss_samples: List[Tuple[float, int]] = []
+    last_snapshot = None
+    started = time.monotonic()
+    try:
+        with open(args.output, "w") as out:
+            while True:
+                elapsed = time.monotonic() - started
+                snapshot = fetch_snapshot(url, args.admin_token, args.top)
+                if snapshot is not None:
+                    last_snapshot = snapshot
+                    with lock:
+                        requests_sent = dict(results)
+                    out.write(json.dumps({
+                        "elapsed_s": round(elapsed, 1),
+                        "requests": requests_sent,
+                        "snapshot": snapshot,
+                    }) + "\n")
+                    out.flush()
+
+                    rss = snapshot.get("rss_bytes")
+                    if rss is not None and elapsed >= args.warmup:
+                        rss_samples.append((elapsed, rss))
+                    slope = rss_slope_mb_per_hour(rss_samples)
+                    print(f"[Soak] t={elapsed:7.0f}s rss={(rss or 0) / 2**20:8.1f}MB "
+                          f"open_files={snapshot.get('open_files')} "
+                          f"requests={sum(requests_sent.values())} "
+                          f"slope={'n/a' if slope is None else f'{slope:.2f}MB/h'}")
+
+                if elapsed >= args.duration:
+                    break
+                stop.wait(min(args.interval, args.duration - elapsed))
+    except KeyboardInterrupt:
+        print("[Soak] Interrupted")
+    finally:
+        stop.set()
+        for client in clients:
+            client.join(timeout=args.timeout)
+        if started_tracing:
+            final = fetch_snapshot(url, args.admin_token, args.top, stop_tracing=True)
+            last_snapshot = final or last_snapshot
+
+    print("\n[Soak] Request outcomes:")
+    for key, count in sorted(results.items()):
+        print(f"  {key}: {count}")
+
+    if last_snapshot and last_snapshot["tracemalloc"]["top"]:
+        print("\n[Soak] Top allocators at end of run:")
+        for stat in last_snapshot["tracemalloc"]["top"]:
+            print(f"  {stat['size_bytes'] / 1024:10.1f} KB  {stat['count']:8d}  {stat['location']}")
+
+    slope = rss_slope_mb_per_hour(rss_samples)
+    if slope is None:
+        print("\n[Soak] Not enough post-warm-up samples to compute RSS slope")
+        return 1
+
+    verdict = "PASS" if slope <= args.max_slope_mb_per_hour else "FAIL"
+    print(f"\n[Soak] {verdict}: RSS slope {slope:.2f} MB/h "
+          f"(limit {args.max_slope_mb_per_hour:.2f} MB/h, {len(rss_samples)} samples)")
+    print(f"[Soak] Samples written to {args.output}")
+    return 0 if verdict == "PASS" else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
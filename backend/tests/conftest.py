@@ -0,0 +1,9 @@
+"""
+Shared test setup: app modules import each other as top-level modules
+(e.g. `from inference import ...`), so put backend/app on sys.path.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
@@ -0,0 +1,41 @@
+"""
+Tests for process memory diagnostics.
+"""
+
+import tracemalloc
+
+import pytest
+
+pytest.importorskip("torch")
+
+import diagnostics
+
+
+@pytest.fixture
+def tracing():
+    was_tracing = tracemalloc.is_tracing()
+    diagnostics.start_tracemalloc(1)
+    yield
+    if not was_tracing:
+        diagnostics.stop_tracemalloc()
+
+
+def test_top_zero_skips_snapshot(tracing, monkeypatch):
+    def fail():
+        raise AssertionError("take_snapshot() should not be called for limit=0")
+
+    monkeypatch.setattr(tracemalloc, "take_snapshot", fail)
+    assert diagnostics.tracemalloc_top(0) == []
+
+
+def test_top_allocators_are_reported(tracing):
+    top = diagnostics.tracemalloc_top(3)
+    assert 0 < len(top) <= 3
+    assert {"location", "size_bytes", "count"} <= set(top[0])
+
+
+def test_snapshot_does_not_scan_gc_objects(monkeypatch):
+    monkeypatch.setattr(diagnostics.gc, "get_objects", lambda *a, **k: pytest.fail("gc.get_objects called"))
+    snapshot = diagnostics.memory_snapshot(top=0)
+    assert snapshot["gc"]["generations"]
+    assert snapshot["tracemalloc"]["top"] == []
@@ -0,0 +1,294 @@
+"""
+Tests for the deadline-aware inference scheduler.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+import scheduler
+from scheduler import InferenceScheduler, LoadShedError
+
+
+def _blocking_job(order: list, name: str, gate: threading.Event = None, started: threading.Event = None):
+    """Return a blocking function that records its name when it runs."""
+    def job():
+        if started is not None:
+            started.set()
+        if gate is not None:
+            gate.wait(timeout=5)
+        order.append(name)
+        return name
+    return job
+
+
+async def _occupy_worker(sched: InferenceScheduler, order: list):
+    """Submit a job that holds the worker until the returned gate is set."""
+    gate, started = threading.Event(), threading.Event()
+    task = asyncio.create_task(sched.submit(_blocking_job(order, "blocker", gate, started)))
+    await asyncio.to_thread(started.wait, 5)
+    return task, gate
+
+
+def test_priority_order_and_fifo_within_priority():
+    async def scenario():
+        sched = InferenceScheduler()
+        order = []
+        blocker, gate = await _occupy_worker(sched, order)
+
+        tasks = [
+            asyncio.create_task(sched.submit(_blocking_job(order, name), priority=priority))
+            for name, priority in [
+                ("bulk-1", "bulk"),
+                ("interactive-1", "interactive"),
+                ("bulk-2", "bulk"),
+                ("interactive-2", "interactive"),
+            ]
+        ]
+        await asyncio.sleep(0.01)
+        gate.set()
+        await asyncio.gather(blocker, *tasks)
+        await sched.stop()
+        return order
+
+    assert asyncio.run(scenario()) == [
+        "blocker", "interactive-1", "interactive-2", "bulk-1", "bulk-2"
+    ]
+
+
+def test_long_waiting_bulk_job_is_promoted(monkeypatch):
+    monkeypatch.setattr(scheduler, "MAX_PRIORITY_WAIT_S", 0.0)
+
+    async def scenario():
+        sched = InferenceScheduler()
+        order = []
+        blocker, gate = await _occupy_worker(sched, order)
+
+        bulk = asyncio.create_task(sched.submit(_blocking_job(order, "bulk"), priority="bulk"))
+        await asyncio.sleep(0.01)
+        interactive = asyncio.create_task(sched.submit(_blocking_job(order, "interactive")))
+        await asyncio.sleep(0.01)
+        gate.set()
+        await asyncio.gather(blocker, bulk, interactive)
+        stats = sched.stats()
+        await sched.stop()
+        return order, stats
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["blocker", "bulk", "interactive"]
+    assert stats["promoted"] >= 1
+
+
+def test_unmeetable_deadline_is_shed_on_submit(monkeypatch):
+    monkeypatch.setattr(scheduler, "INITIAL_SERVICE_TIME_S", 1.0)
+
+    async def scenario():
+        sched = InferenceScheduler()
+        with pytest.raises(LoadShedError) as exc_info:
+            await sched.submit(_blocking_job([], "late"), deadline_ms=100)
+        stats = sched.stats()
+        await sched.stop()
+        return exc_info.value, stats
+
+    error, stats = asyncio.run(scenario())
+    assert error.reason == "unmeetable"
+    assert stats["shed_unmeetable"] == 1
+
+
+def test_unmeetable_estimate_scales_with_cost(monkeypatch):
+    monkeypatch.setattr(scheduler, "INITIAL_SERVICE_TIME_S", 0.01)
+
+    async def scenario():
+        sched = InferenceScheduler()
+        single = await sched.submit(_blocking_job([], "single"), deadline_ms=1000, cost=1)
+        with pytest.raises(LoadShedError) as exc_info:
+            await sched.submit(_blocking_job([], "batch"), deadline_ms=100, cost=32)
+        await sched.stop()
+        return single, exc_info.value
+
+    single, error = asyncio.run(scenario())
+    assert single == "single"
+    assert error.reason == "unmeetable"
+
+
+def test_queued_job_expires_on_time_behind_busy_worker(monkeypatch):
+    monkeypatch.setattr(scheduler, "INITIAL_SERVICE_TIME_S", 0.01)
+
+    async def scenario():
+        sched = InferenceScheduler()
+        order = []
+        blocker, gate = await _occupy_worker(sched, order)
+
+        started = time.monotonic()
+        with pytest.raises(LoadShedError) as exc_info:
+            await sched.submit(_blocking_job(order, "bulk"), priority="bulk", deadline_ms=200)
+        elapsed = time.monotonic() - started
+        stats = sched.stats()
+
+        gate.set()
+        await blocker
+        await sched.stop()
+        return exc_info.value, elapsed, stats, order
+
+    error, elapsed, stats, order = asyncio.run(scenario())
+    assert error.reason == "expired"
+    assert elapsed < 1.0
+    assert stats["shed_expired"] == 1
+    assert stats["queued"] == {"interactive": 0, "bulk": 0}
+    assert order == ["blocker"]
+
+
+def test_queue_full_is_shed(monkeypatch):
+    monkeypatch.setattr(scheduler, "MAX_QUEUE_DEPTH", 1)
+
+    async def scenario():
+        sched = InferenceScheduler()
+        order = []
+        blocker, gate = await _occupy_worker(sched, order)
+
+        queued = asyncio.create_task(sched.submit(_blocking_job(order, "queued")))
+        await asyncio.sleep(0.01)
+        with pytest.raises(LoadShedError) as exc_info:
+            await sched.submit(_blocking_job(order, "overflow"))
+
+        gate.set()
+        await asyncio.gather(blocker, queued)
+        await sched.stop()
+        return exc_info.value, order
+
+    error, order = asyncio.run(scenario())
+    assert error.reason == "queue_full"
+    assert order == ["blocker", "queued"]
+
+
+def test_stop_fails_running_and_queued_jobs():
+    async def scenario():
+        sched = InferenceScheduler()
+        order = []
+        blocker, gate = await _occupy_worker(sched, order)
+        queued = asyncio.create_task(sched.submit(_blocking_job(order, "queued")))
+        await asyncio.sleep(0.01)
+
+        await sched.stop()
+        results = await asyncio.gather(blocker, queued, return_exceptions=True)
+        gate.set()
+        return results
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, LoadShedError) and r.reason == "shutdown" for r in results)
+
+
+def test_job_exception_propagates_to_caller():
+    def broken():
+        raise ValueError("boom")
+
+    async def scenario():
+        sched = InferenceScheduler()
+        with pytest.raises(ValueError):
+            await sched.submit(broken)
+        stats = sched.stats()
+        await sched.stop()
+        return stats
+
+    assert asyncio.run(scenario())["failed"] == 1
+
+
+def test_cancelled_caller_frees_queue_slot(monkeypatch):
+    monkeypatch.setattr(scheduler, "INITIAL_SERVICE_TIME_S", 0.1)
+
+    async def scenario():
+        sched = InferenceScheduler()
+        order = []
+        blocker, gate = await _occupy_worker(sched, order)
+
+        abandoned = [
+            asyncio.create_task(sched.submit(_blocking_job(order, f"abandoned-{i}")))
+            for i in range(5)
+        ]
+        await asyncio.sleep(0.01)
+        for task in abandoned:
+            task.cancel()
+        await asyncio.gather(*abandoned, return_exceptions=True)
+        queued = sched.stats()["queued"]
+
+        # Blocker (0.1 s) + this job (0.1 s) fits; five dead jobs ahead would not
+        kept = asyncio.create_task(sched.submit(_blocking_job(order, "kept"), deadline_ms=450))
+        await asyncio.sleep(0.01)
+        gate.set()
+        await asyncio.gather(blocker, kept)
+        await sched.stop()
+        return queued, order
+
+    queued, order = asyncio.run(scenario())
+    assert queued == {"interactive": 0, "bulk": 0}
+    assert order == ["blocker", "kept"]
+
+
+def test_overdue_bulk_job_counts_as_ahead(monkeypatch):
+    monkeypatch.setattr(scheduler, "INITIAL_SERVICE_TIME_S", 0.1)
+
+    async def scenario():
+        sched = InferenceScheduler()
+        order = []
+        blocker, gate = await _occupy_worker(sched, order)
+
+        bulk = asyncio.create_task(sched.submit(_blocking_job(order, "bulk"), priority="bulk"))
+        await asyncio.sleep(0.01)
+
+        # Not yet overdue: bulk work is not ahead of interactive work
+        fits = asyncio.create_task(sched.submit(_blocking_job(order, "fits"), deadline_ms=250))
+        await asyncio.sleep(0.01)
+
+        # Overdue: bulk will be promoted, so blocker + fits + bulk + this job > 350 ms
+        monkeypatch.setattr(scheduler, "MAX_PRIORITY_WAIT_S", 0.0)
+        with pytest.raises(LoadShedError) as exc_info:
+            await sched.submit(_blocking_job(order, "late"), deadline_ms=350)
+
+        gate.set()
+        await asyncio.gather(blocker, bulk, fits)
+        await sched.stop()
+        return exc_info.value
+
+    assert asyncio.run(scenario()).reason == "unmeetable"
+
+
+def test_service_time_is_tracked_per_function():
+    def slow_decode():
+        time.sleep(0.05)
+
+    def fast_tensor():
+        pass
+
+    async def scenario():
+        sched = InferenceScheduler()
+        for _ in range(5):
+            await sched.submit(slow_decode)
+            await sched.submit(fast_tensor)
+        stats = sched.stats()
+        await sched.stop()
+        return stats["service_time_per_image_ms"]
+
+    estimates = asyncio.run(scenario())
+    assert estimates["slow_decode"] > estimates["fast_tensor"]
+
+
+def test_fallback_results_do_not_update_service_time():
+    def corrupt_upload():
+        return {"pred": "CSE Building", "notes": "Error: cannot identify image file"}
+
+    def corrupt_batch():
+        return [{"pred": "CSE Building", "notes": "Error: bad tensor"}]
+
+    async def scenario():
+        sched = InferenceScheduler()
+        await sched.submit(corrupt_upload)
+        await sched.submit(corrupt_batch)
+        stats = sched.stats()
+        await sched.stop()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats["completed"] == 2
+    assert stats["service_time_per_image_ms"] == {}
@@ -0,0 +1,93 @@
+"""
+Tests for WebSocket streaming: frame fingerprints and /ws/predict behaviour.
+"""
+
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from main import STREAM_SKIP_THRESHOLD
+from utils import image_fingerprint, fingerprint_distance
+
+
+def _jpeg(pixels: np.ndarray) -> bytes:
+    with BytesIO() as buffer:
+        Image.fromarray(pixels).save(buffer, format="JPEG", quality=90)
+        return buffer.getvalue()
+
+
+def _frame(seed: int, size=(240, 320)) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, size=(*size, 3), dtype=np.uint8)
+
+
+# ============================================================================
+# Fingerprints
+# ============================================================================
+
+def test_identical_frames_are_below_skip_threshold():
+    frame = _jpeg(_frame(0))
+    a, b = image_fingerprint(frame), image_fingerprint(frame)
+    assert a.shape == (16, 16)
+    assert fingerprint_distance(a, b) < STREAM_SKIP_THRESHOLD
+
+
+def test_recompressed_frame_is_below_skip_threshold():
+    pixels = _frame(0)
+    a = image_fingerprint(_jpeg(pixels))
+    with BytesIO() as buffer:
+        Image.fromarray(pixels).save(buffer, format="JPEG", quality=70)
+        b = image_fingerprint(buffer.getvalue())
+    assert fingerprint_distance(a, b) < STREAM_SKIP_THRESHOLD
+
+
+def test_changed_frame_is_above_skip_threshold():
+    a = image_fingerprint(_jpeg(np.zeros((240, 320, 3), dtype=np.uint8)))
+    b = image_fingerprint(_jpeg(np.full((240, 320, 3), 128, dtype=np.uint8)))
+    assert fingerprint_distance(a, b) > STREAM_SKIP_THRESHOLD
+
+
+def test_undecodable_frame_has_no_fingerprint():
+    assert image_fingerprint(b"garbage") is None
+
+
+# ============================================================================
+# /ws/predict
+# ============================================================================
+
+@pytest.fixture
+def client():
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+    from main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def test_stream_reports_undecodable_frame_as_error(client):
+    with client.websocket_connect("/ws/predict") as ws:
+        ws.send_bytes(b"garbage")
+        message = ws.receive_json()
+    assert message["frame_id"] == 0
+    assert "error" in message
+    assert "pred" not in message
+
+
+def test_stream_skips_duplicates_and_reruns_changed_frames(client):
+    dark = _jpeg(np.zeros((240, 320, 3), dtype=np.uint8))
+    bright = _jpeg(np.full((240, 320, 3), 200, dtype=np.uint8))
+
+    with client.websocket_connect("/ws/predict") as ws:
+        messages = []
+        for frame in (dark, dark, bright):
+            ws.send_bytes(frame)
+            messages.append(ws.receive_json())
+
+    assert [m["frame_id"] for m in messages] == [0, 1, 2]
+    assert [m["skipped"] for m in messages] == [False, True, False]
+    assert messages[1]["source_frame_id"] == 0
+    assert messages[1]["pred"] == messages[0]["pred"]
+    assert messages[2]["source_frame_id"] == 2
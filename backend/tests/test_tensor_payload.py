@@ -0,0 +1,168 @@
+"""
+Tests for pre-decoded tensor ingestion (/predict/tensor payload parsing).
+"""
+
+import asyncio
+from io import BytesIO
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import inference
+from inference import INPUT_SIZE, MAX_TENSOR_BATCH, MAX_TENSOR_PAYLOAD_BYTES, decode_tensor_payload
+from main import _read_body_limited
+
+NPY = "application/x-npy"
+RAW = "application/octet-stream"
+
+
+def _images(n: int, dtype=np.uint8) -> np.ndarray:
+    rng = np.random.default_rng(n)
+    return rng.integers(0, 256, size=(n, INPUT_SIZE, INPUT_SIZE, 3)).astype(dtype)
+
+
+def _npy_bytes(array: np.ndarray, version=None) -> bytearray:
+    with BytesIO() as buffer:
+        np.lib.format.write_array(buffer, array, version=version)
+        return bytearray(buffer.getvalue())
+
+
+# ============================================================================
+# .npy payloads
+# ============================================================================
+
+@pytest.mark.parametrize("version", [(1, 0), (2, 0)])
+def test_npy_header_versions(version):
+    images = _images(2)
+    batch = decode_tensor_payload(_npy_bytes(images, version), content_type=NPY)
+    assert batch.shape == (2, INPUT_SIZE, INPUT_SIZE, 3)
+    np.testing.assert_array_equal(batch, images)
+
+
+def test_npy_wraps_body_without_copy():
+    payload = _npy_bytes(_images(1))
+    batch = decode_tensor_payload(payload, content_type=NPY)
+    assert batch.flags.writeable
+    assert np.shares_memory(batch, np.frombuffer(payload, dtype=np.uint8))
+
+
+def test_npy_rejects_fortran_order():
+    images = np.asfortranarray(_images(1)[0])
+    with pytest.raises(ValueError, match="Fortran"):
+        decode_tensor_payload(_npy_bytes(images), content_type=NPY)
+
+
+def test_npy_rejects_wrong_dtype():
+    with pytest.raises(ValueError, match="uint8"):
+        decode_tensor_payload(_npy_bytes(_images(1, np.float32)), content_type=NPY)
+
+
+def test_npy_rejects_length_mismatch():
+    payload = _npy_bytes(_images(1))
+    with pytest.raises(ValueError, match="needs"):
+        decode_tensor_payload(payload[:-10], content_type=NPY)
+
+
+def test_npy_content_type_requires_magic():
+    with pytest.raises(ValueError, match="magic"):
+        decode_tensor_payload(bytearray(_images(1).tobytes()), content_type=NPY)
+
+
+# ============================================================================
+# Raw payloads
+# ============================================================================
+
+def test_raw_payload_selected_by_content_type_even_with_npy_magic():
+    images = _images(1)
+    flat = images.reshape(-1)
+    flat[:len(inference.NPY_MAGIC)] = np.frombuffer(inference.NPY_MAGIC, dtype=np.uint8)
+    batch = decode_tensor_payload(
+        bytearray(images.tobytes()), (1, INPUT_SIZE, INPUT_SIZE, 3), content_type=RAW
+    )
+    np.testing.assert_array_equal(batch, images)
+
+
+def test_raw_payload_requires_shape():
+    with pytest.raises(ValueError, match="requires a shape"):
+        decode_tensor_payload(bytearray(_images(1).tobytes()), content_type=RAW)
+
+
+def test_raw_payload_length_mismatch():
+    with pytest.raises(ValueError, match="needs"):
+        decode_tensor_payload(bytearray(10), (1, INPUT_SIZE, INPUT_SIZE, 3), content_type=RAW)
+
+
+def test_hwc_is_promoted_to_batch_of_one():
+    image = _images(1)[0]
+    batch = decode_tensor_payload(bytearray(image.tobytes()), image.shape, content_type=RAW)
+    assert batch.shape == (1, INPUT_SIZE, INPUT_SIZE, 3)
+
+
+def test_wrong_image_size_is_rejected():
+    shape = (1, INPUT_SIZE - 1, INPUT_SIZE, 3)
+    with pytest.raises(ValueError, match="Expected shape"):
+        decode_tensor_payload(bytearray(int(np.prod(shape))), shape, content_type=RAW)
+
+
+@pytest.mark.parametrize("n", [0, MAX_TENSOR_BATCH + 1])
+def test_batch_size_bounds(n):
+    shape = (n, INPUT_SIZE, INPUT_SIZE, 3)
+    with pytest.raises(ValueError, match="Batch size"):
+        decode_tensor_payload(bytearray(int(np.prod(shape))), shape, content_type=RAW)
+
+
+def test_max_batch_accepted():
+    shape = (MAX_TENSOR_BATCH, INPUT_SIZE, INPUT_SIZE, 3)
+    batch = decode_tensor_payload(bytearray(int(np.prod(shape))), shape, content_type=RAW)
+    assert batch.shape[0] == MAX_TENSOR_BATCH
+
+
+def test_preprocess_normalizes_to_nchw():
+    batch = np.full((1, INPUT_SIZE, INPUT_SIZE, 3), 255, dtype=np.uint8)
+    tensor = inference.preprocess_uint8_batch(batch)
+    assert tuple(tensor.shape) == (1, 3, INPUT_SIZE, INPUT_SIZE)
+    expected = (1.0 - np.array(inference.IMAGENET_MEAN)) / np.array(inference.IMAGENET_STD)
+    np.testing.assert_allclose(tensor[0, :, 0, 0].cpu().numpy(), expected, rtol=1e-5)
+
+
+# ============================================================================
+# Body size limit
+# ============================================================================
+
+def _request(chunks, content_length=None) -> Request:
+    headers = []
+    if content_length is not None:
+        headers.append((b"content-length", str(content_length).encode()))
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+        for i, chunk in enumerate(chunks)
+    ]
+
+    async def receive():
+        return messages.pop(0)
+
+    return Request({"type": "http", "method": "POST", "headers": headers}, receive)
+
+
+def test_body_within_limit_is_read_into_bytearray():
+    body = asyncio.run(_read_body_limited(_request([b"ab", b"cd"], 4), 4))
+    assert body == bytearray(b"abcd")
+    assert isinstance(body, bytearray)
+
+
+def test_content_length_over_limit_is_413():
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(_read_body_limited(_request([b""], MAX_TENSOR_PAYLOAD_BYTES + 1),
+                                       MAX_TENSOR_PAYLOAD_BYTES))
+    assert exc_info.value.status_code == 413
+
+
+def test_streamed_body_over_limit_is_413():
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(_read_body_limited(_request([b"abc", b"def"]), 4))
+    assert exc_info.value.status_code == 413